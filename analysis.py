@@ -0,0 +1,60 @@
+# ==============================================================================
+# METRICS AND ANALYSIS FORMATTING
+# ==============================================================================
+# Pure helpers for the metrics step and the Detailed Analysis tab, kept apart from
+# app.py so they import without Google Cloud credentials.
+import re
+from typing import Optional
+
+import orjson
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Detailed Analysis tab: metrics JSON block followed by the LLM narrative
+ANALYSIS_TEMPLATE = "```json\n{metrics_json}\n```\n\n{narrative}"
+# Fallbacks for a JSON preamble the LLM may still emit. Both are anchored at the
+# start of the text so they are tried once instead of on every line.
+# A fenced block: ends at the closing fence, so nested braces are fine.
+JSON_FENCE_RE = re.compile(r'\A\s*```json.*?```\s*', re.DOTALL)
+# A bare 'json {...}' line: runs to the last '}' on that line.
+JSON_PREAMBLE_RE = re.compile(r'\A\s*json\s+\{.*\}[ \t]*(?:\n|\Z)\s*')
+
+
+def compute_metrics(transactions: Optional[pa.Table]) -> dict:
+    """Income, spending and extremes of the 'amount' column (all zero without rows)."""
+    if transactions is None or transactions.num_rows == 0:
+        return {
+            "total_income": 0,
+            "total_spending": 0,
+            "net_flow": 0,
+            "transaction_count": 0,
+            "largest_transaction": 0,
+            "smallest_transaction": 0,
+        }
+
+    # Columnar reductions straight on the Arrow column (nulls are skipped)
+    amounts = transactions.column('amount').cast(pa.float64())
+    is_income = pc.greater(amounts, 0)
+    total_income = pc.sum(pc.filter(amounts, is_income)).as_py() or 0.0
+    total_spending = pc.sum(pc.filter(amounts, pc.invert(is_income))).as_py() or 0.0
+    extremes = pc.min_max(amounts)
+    return {
+        "total_income": total_income,
+        "total_spending": total_spending,
+        "net_flow": total_income + total_spending,
+        "transaction_count": transactions.num_rows,
+        "largest_transaction": extremes['max'].as_py() or 0.0,
+        "smallest_transaction": extremes['min'].as_py() or 0.0,
+    }
+
+
+def combine_analysis(metrics: dict, detailed_analysis: str) -> str:
+    """Prefix the LLM's markdown with the metrics as a JSON block."""
+    metrics_json = orjson.dumps({
+        "total_income": metrics['total_income'],
+        "total_spending": metrics['total_spending'],
+        "net_flow": metrics['net_flow']
+    }).decode()
+    narrative = JSON_FENCE_RE.sub('', detailed_analysis, count=1)
+    narrative = JSON_PREAMBLE_RE.sub('', narrative, count=1)
+    return ANALYSIS_TEMPLATE.format(metrics_json=metrics_json, narrative=narrative)
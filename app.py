@@ -2,24 +2,33 @@
 # PART 0: IMPORTS AND SETUP
 # ==============================================================================
 import os
-import re
-import json
+import asyncio
+import threading
+import time
+from functools import lru_cache
 from pathlib import Path
-from typing import TypedDict
+from typing import Optional, TypedDict
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 import markdown
+import orjson
+import pyarrow as pa
 
 # --- Core AI and Data Libraries ---
 from google.oauth2 import service_account
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 from langchain.tools import tool
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.chains import LLMChain
 from langchain_core.prompts import ChatPromptTemplate
 from langgraph.graph import StateGraph, END
+from analysis import combine_analysis, compute_metrics
+from background_loop import BackgroundLoop
+from llm_cache import CachedChatModel, LRUCacheBackend, RedisCacheBackend
+from singleflight import Abandoned, SingleFlight
 
 # --- Web Framework Library ---
-from flask import Flask, render_template, request
+from flask import Flask, Response, render_template, request, stream_with_context
 
 # ==============================================================================
 # PART 1: ENVIRONMENT AND CONFIGURATION
@@ -32,22 +41,91 @@ load_dotenv()
 GCP_PROJECT_ID = "calcium-scholar-467311-t5"
 credentials_path = Path("key.json")  # Make sure key.json is in the same folder
 
+@lru_cache(maxsize=1)
+def load_credentials() -> service_account.Credentials:
+    """Parse key.json once; every Google Cloud client shares the same credentials."""
+    return service_account.Credentials.from_service_account_file(str(credentials_path))
+
+# --- Demo Users ---
+USER_IDS = ["user_001", "user_002", "user_003", "user_004", "user_005"]
+
+# --- Precomputed Reports ---
+# Reports for USER_IDS are computed at startup and refreshed on this interval.
+# Set WARM_REPORTS=false to compute them on demand only.
+WARM_REPORTS = os.getenv("WARM_REPORTS", "true").lower() == "true"
+REPORT_REFRESH_HOURS = float(os.getenv("REPORT_REFRESH_HOURS", "6"))
+REPORT_REFRESH_SECONDS = max(1, int(REPORT_REFRESH_HOURS * 3600))
+# Kept for two intervals, so one failed refresh still leaves the previous report
+REPORT_TTL = 2 * REPORT_REFRESH_SECONDS
+# A report whose transaction fetch failed is retried, never stored
+REPORT_FETCH_ATTEMPTS = 3
+REPORT_RETRY_SECONDS = 60
+
+# --- Workflow Mode ---
+# Set BATCHED_REPORT=true to produce analysis, budget and investments in one LLM call.
+BATCHED_REPORT = os.getenv("BATCHED_REPORT", "false").lower() == "true"
+
 # --- LLM Initialization ---
 if not os.getenv("GOOGLE_API_KEY"):
     raise ValueError("🔴 GOOGLE_API_KEY not found in .env")
 
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-pro-latest", temperature=0.1)
+# --- LLM Response Cache ---
+# Identical prompts (same metrics, same upstream text) are answered from the cache.
+LLM_CACHE_TTL = 3600
+
+if os.getenv("REDIS_HOST"):
+    import redis
+    redis_client = redis.Redis(
+        host=os.getenv("REDIS_HOST"), port=int(os.getenv("REDIS_PORT", "6379"))
+    )
+    cache_backend = RedisCacheBackend(redis_client)
+else:
+    redis_client = None
+    cache_backend = LRUCacheBackend(maxsize=256)
+
+# Generation time grows with output length, so cap it and bound each call.
+LLM_MAX_OUTPUT_TOKENS = 1200
+LLM_TIMEOUT = 30
+
+def cached_gemini(model: str, max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS, timeout: int = LLM_TIMEOUT) -> CachedChatModel:
+    return CachedChatModel(
+        ChatGoogleGenerativeAI(
+            model=model,
+            temperature=0.1,
+            max_output_tokens=max_output_tokens,
+            timeout=timeout,
+        ),
+        backend=cache_backend,
+        ttl=LLM_CACHE_TTL,
+    )
+
+# Pro for the analysis; the faster Flash model for the budget and investment write-ups.
+analyst_llm = cached_gemini("gemini-1.5-pro-latest")
+llm = cached_gemini("gemini-1.5-flash-latest")
+# Batched mode writes all three sections in a single response
+report_llm = cached_gemini("gemini-1.5-pro-latest", max_output_tokens=3 * LLM_MAX_OUTPUT_TOKENS, timeout=3 * LLM_TIMEOUT)
 
 # ==============================================================================
 # PART 2: BIGQUERY TOOL
 # ==============================================================================
 
+# One authenticated client for the process; it keeps its HTTP connection pool warm.
+bq_client = bigquery.Client(credentials=load_credentials(), project=GCP_PROJECT_ID)
+# Streams query results as Arrow record batches over gRPC instead of paging JSON rows over REST.
+bq_storage_client = bigquery_storage.BigQueryReadClient(credentials=load_credentials())
+
+# Transactions change rarely, so repeat analyses of a user skip BigQuery for a while.
+TRANSACTION_CACHE_TTL = 300
+transaction_cache = LRUCacheBackend(maxsize=128)
+
 @tool
-def get_transaction_data(user_id: str) -> list:
-    """Fetch transaction data from BigQuery."""
+def get_transaction_data(user_id: str) -> pa.Table:
+    """Fetch transaction data from BigQuery as a columnar Arrow table."""
+    cached = transaction_cache.get(user_id)
+    if cached is not None:
+        return cached
+
     try:
-        credentials = service_account.Credentials.from_service_account_file(str(credentials_path))
-        client = bigquery.Client(credentials=credentials, project=GCP_PROJECT_ID)
         table_id = f"{GCP_PROJECT_ID}.finance_data.transactions"
 
         query = f"""
@@ -59,18 +137,16 @@ def get_transaction_data(user_id: str) -> list:
         job_config = bigquery.QueryJobConfig(
             query_parameters=[bigquery.ScalarQueryParameter("user_id", "STRING", user_id)]
         )
-        query_job = client.query(query, job_config=job_config)
-        results = query_job.result()
-        transactions = [dict(row) for row in results]
-
-        for t in transactions:
-            t['date'] = t['date'].isoformat()
+        query_job = bq_client.query(query, job_config=job_config)
+        results = query_job.result(page_size=10000)
+        transactions = results.to_arrow(bqstorage_client=bq_storage_client)
 
+        transaction_cache.set(user_id, transactions, ttl=TRANSACTION_CACHE_TTL)
         return transactions
 
     except Exception as e:
         print(f"BigQuery error: {e}")
-        return []
+        return None
 
 tools = [get_transaction_data]
 
@@ -80,110 +156,182 @@ tools = [get_transaction_data]
 
 class FinancialGraphState(TypedDict):
     user_id: str
+    metrics: dict
+    fetch_failed: bool  # BigQuery errored, so metrics are placeholders
     analysis_result: str
     budget_plan: str
     investment_options: str
 
-def analyzer_agent_node(state: FinancialGraphState):
-    """Analyze transactions and produce JSON + markdown analysis."""
-    print("🔍 Analyzer Agent running...")
+def budget_skeleton(metrics: dict) -> str:
+    """Deterministic 50/30/20 split of the user's income."""
+    income = metrics['total_income']
+    return (f"Needs (50%): ${income * 0.5:,.2f}\n"
+            f"Wants (30%): ${income * 0.3:,.2f}\n"
+            f"Savings & Investments (20%): ${income * 0.2:,.2f}")
+
+# --- Agent Chains ---
+# Prompts, model bindings and the structured-output schema are built once at import
+# rather than on every node call.
+
+class FinancialReport(BaseModel):
+    """All three report sections, returned by a single structured LLM call."""
+    analysis: str = Field(description="Detailed financial analysis in markdown.")
+    budget_plan: str = Field(description="Detailed, encouraging budget plan in markdown.")
+    investment_options: str = Field(description="Personalized, beginner-friendly investment suggestions in markdown.")
+
+analyzer_chain = ChatPromptTemplate.from_messages([
+    ("system", "You are a meticulous financial analyst AI. "
+               "Respond in raw markdown. Do not wrap it in code fences or add a JSON preamble."),
+    ("human", "Here is the user's transaction summary:\n"
+              "Total Income: {total_income}\n"
+              "Total Spending: {total_spending}\n"
+              "Net Flow: {net_flow}\n\n"
+              "Provide a detailed financial analysis in markdown. "
+              "These figures are already shown to the user: do NOT restate them, "
+              "focus on interpreting them.")
+]) | analyst_llm
+
+budgetor_chain = ChatPromptTemplate.from_messages([
+    ("system", "You are a friendly budgeting expert."),
+    ("human", "Here is the user's financial position:\n"
+              "Total Income: {total_income}\n"
+              "Total Spending: {total_spending}\n"
+              "Net Flow: {net_flow}\n\n"
+              "Starting outline (50/30/20):\n{budget}\n\n"
+              "Create a detailed, encouraging budget plan.")
+]) | llm
+
+investor_chain = ChatPromptTemplate.from_messages([
+    ("system", "You are a financial educator providing beginner-friendly investment advice."),
+    ("human", "Here is the user's financial position:\n"
+              "Total Income: {total_income}\n"
+              "Total Spending: {total_spending}\n"
+              "Net Flow: {net_flow}\n\n"
+              "Budget outline:\n{budget}\n\n"
+              "Estimated amount available to invest: {estimated_savings}\n\n"
+              "Provide personalized investment suggestions.")
+]) | llm
+
+report_chain = ChatPromptTemplate.from_messages([
+    ("system", "You are a meticulous financial analyst, a friendly budgeting expert "
+               "and a financial educator providing beginner-friendly investment advice. "
+               "Write each section as raw markdown, without code fences."),
+    ("human", "Here is the user's transaction summary:\n"
+              "Total Income: {total_income}\n"
+              "Total Spending: {total_spending}\n"
+              "Net Flow: {net_flow}\n\n"
+              "Budget outline:\n{budget}\n\n"
+              "Provide a detailed financial analysis, a detailed and encouraging budget plan, "
+              "and personalized investment suggestions, each in markdown. "
+              "The figures are already shown to the user: do NOT restate them in the analysis.")
+]) | report_llm.with_structured_output(FinancialReport)
+
+async def metrics_node(state: FinancialGraphState):
+    """Fetch transactions and compute the metrics every agent is seeded with."""
+    print("🧮 Metrics step running...")
     user_id = state['user_id']
 
     # Fetch transactions
-    transactions = get_transaction_data(user_id)
-
-    if not transactions:
-        total_income = 0
-        total_spending = 0
-        net_flow = 0
-        summary_text = "No transactions found for this user."
-    else:
-        total_income = sum(t['amount'] for t in transactions if t['amount'] > 0)
-        total_spending = sum(t['amount'] for t in transactions if t['amount'] < 0)
-        net_flow = total_income + total_spending
-
-        summary_text = f"User has {len(transactions)} transactions. " \
-                       f"Largest transaction: ${max(t['amount'] for t in transactions):,.2f}, " \
-                       f"Smallest transaction: ${min(t['amount'] for t in transactions):,.2f}."
-
-    # LLM prompt for detailed markdown report
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a meticulous financial analyst AI."),
-        ("human", "Here is the user's transaction summary:\n"
-                  "Total Income: {total_income}\n"
-                  "Total Spending: {total_spending}\n"
-                  "Net Flow: {net_flow}\n\n"
-                  "Provide a detailed financial analysis in markdown.")
-    ])
-
-    chain = LLMChain(llm=llm, prompt=prompt)
-    detailed_analysis = chain.run({
-        "total_income": total_income,
-        "total_spending": total_spending,
-        "net_flow": net_flow
-    })
-
-
-    # Combine JSON + markdown
-    metrics_json = json.dumps({
-        "total_income": total_income,
-        "total_spending": total_spending,
-        "net_flow": net_flow
-    })
-
-    # Remove any leading 'json {...}' line from LLM output
-    detailed_analysis_clean = re.sub(r'^json\s+(\{.*?\})\s*', '', detailed_analysis, flags=re.MULTILINE)
-
-    # Combine JSON metrics with cleaned markdown
-    full_analysis = f"```json\n{metrics_json}\n```"
-    full_analysis += f"\n\n{detailed_analysis_clean}"
-
-    return {"analysis_result": full_analysis}
+    transactions = await get_transaction_data.ainvoke(user_id)
 
+    metrics = compute_metrics(transactions)
+    return {"metrics": metrics, "fetch_failed": transactions is None}
 
+async def analyzer_agent_node(state: FinancialGraphState):
+    """Produce JSON + markdown analysis from the precomputed metrics."""
+    print("🔍 Analyzer Agent running...")
+    metrics = state['metrics']
 
+    detailed_analysis = (await analyzer_chain.ainvoke({
+        "total_income": metrics['total_income'],
+        "total_spending": metrics['total_spending'],
+        "net_flow": metrics['net_flow']
+    })).content
 
+    return {"analysis_result": combine_analysis(metrics, detailed_analysis)}
 
-def budgetor_agent_node(state: FinancialGraphState):
+async def budgetor_agent_node(state: FinancialGraphState):
+    """Seeded from metrics rather than the analyzer's text so it runs alongside it."""
     print("📝 Budgetor Agent running...")
-    analysis = state['analysis_result']
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a friendly budgeting expert."),
-        ("human", "Here is the user's financial analysis:\n\n{analysis}\n\n"
-                  "Create a detailed, encouraging budget plan.")
-    ])
-
-    chain = LLMChain(llm=llm, prompt=prompt)
-    budget_plan = chain.run({"analysis": analysis})
+    metrics = state['metrics']
+
+    budget_plan = (await budgetor_chain.ainvoke({
+        "total_income": metrics['total_income'],
+        "total_spending": metrics['total_spending'],
+        "net_flow": metrics['net_flow'],
+        "budget": budget_skeleton(metrics)
+    })).content
     return {"budget_plan": budget_plan}
 
-def investor_agent_node(state: FinancialGraphState):
+async def investor_agent_node(state: FinancialGraphState):
+    """Seeded from metrics + the 50/30/20 skeleton so it runs alongside the other agents."""
     print("📈 Investor Agent running...")
-    budget = state['budget_plan']
+    metrics = state['metrics']
+
+    investment_options = (await investor_chain.ainvoke({
+        "total_income": metrics['total_income'],
+        "total_spending": metrics['total_spending'],
+        "net_flow": metrics['net_flow'],
+        "budget": budget_skeleton(metrics),
+        "estimated_savings": f"${max(metrics['net_flow'], 0) * 0.2:,.2f}"
+    })).content
+    return {"investment_options": investment_options}
 
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a financial educator providing beginner-friendly investment advice."),
-        ("human", "Here is the user's budget plan:\n\n{budget}\n\n"
-                  "Provide personalized investment suggestions.")
-    ])
+async def full_report_node(state: FinancialGraphState):
+    """Batched alternative to the three agents: one round trip, one shared context."""
+    print("🧾 Full Report Agent running...")
+    metrics = state['metrics']
 
-    chain = LLMChain(llm=llm, prompt=prompt)
-    investment_options = chain.run({"budget": budget})
-    return {"investment_options": investment_options}
+    report = await report_chain.ainvoke({
+        "total_income": metrics['total_income'],
+        "total_spending": metrics['total_spending'],
+        "net_flow": metrics['net_flow'],
+        "budget": budget_skeleton(metrics)
+    })
+
+    if report is None:
+        # Gemini returned no tool call (e.g. output cut off at max_output_tokens)
+        print("⚠️ Batched report was empty; falling back to the three agents.")
+        sections = await asyncio.gather(
+            analyzer_agent_node(state),
+            budgetor_agent_node(state),
+            investor_agent_node(state),
+        )
+        return {key: value for section in sections for key, value in section.items()}
+
+    return {
+        "analysis_result": combine_analysis(metrics, report.analysis),
+        "budget_plan": report.budget_plan,
+        "investment_options": report.investment_options,
+    }
 
 # ==============================================================================
 # PART 4: WORKFLOW
 # ==============================================================================
 
 workflow = StateGraph(FinancialGraphState)
-workflow.add_node("analyzer", analyzer_agent_node)
-workflow.add_node("budgetor", budgetor_agent_node)
-workflow.add_node("investor", investor_agent_node)
-workflow.set_entry_point("analyzer")
-workflow.add_edge("analyzer", "budgetor")
-workflow.add_edge("budgetor", "investor")
-workflow.add_edge("investor", END)
+workflow.add_node("metrics", metrics_node)
+workflow.set_entry_point("metrics")
+
+if BATCHED_REPORT:
+    # metrics -> report
+    workflow.add_node("report", full_report_node)
+    report_nodes = ["report"]
+else:
+    # metrics -> analyzer | budgetor | investor   (all three LLM calls run concurrently)
+    workflow.add_node("analyzer", analyzer_agent_node)
+    workflow.add_node("budgetor", budgetor_agent_node)
+    workflow.add_node("investor", investor_agent_node)
+    report_nodes = ["analyzer", "budgetor", "investor"]
+
+def route_after_metrics(state: FinancialGraphState):
+    """Stop before any LLM call when the transactions could not be fetched."""
+    return END if state.get("fetch_failed") else report_nodes
+
+workflow.add_conditional_edges("metrics", route_after_metrics, [*report_nodes, END])
+for node in report_nodes:
+    workflow.add_edge(node, END)
+
 app_logic = workflow.compile()
 
 # ==============================================================================
@@ -192,32 +340,193 @@ app_logic = workflow.compile()
 
 app = Flask(__name__)
 
+# Templates never change at runtime: skip the per-render stat() and compile index.html up front.
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+with app.app_context():
+    app.jinja_env.get_template('index.html')
+
+@lru_cache(maxsize=256)
+def render_markdown(text: str) -> str:
+    return markdown.markdown(text)
+
 @app.template_filter('markdown')
 def markdown_filter(text):
-    return markdown.markdown(text)
+    return render_markdown(text)
 
-def parse_metrics(analysis_result: str):
+def format_metrics(data: dict):
+    """Display values for the metric cards, taken straight from the metrics step."""
     metrics = {"Total Income": "N/A", "Total Spending": "N/A", "Net Flow": ("N/A", "text-secondary")}
+    if not data:
+        return metrics
+
+    income = data.get("total_income", 0)
+    spending = data.get("total_spending", 0)
+    net_flow = data.get("net_flow", 0)
+
+    metrics["Total Income"] = f"${income:,.2f}"
+    metrics["Total Spending"] = f"${abs(spending):,.2f}"
+    delta_color = "text-danger" if net_flow < 0 else "text-success"
+    metrics["Net Flow"] = (f"${net_flow:,.2f}", delta_color)
+    return metrics
+
+# Report section each agent node fills, for routing streamed tokens to the right tab
+REPORT_SECTIONS = {
+    "analyzer": "analysis_result",
+    "budgetor": "budget_plan",
+    "investor": "investment_options",
+}
+
+# Shown instead of a $0.00 report when BigQuery could not be reached
+FETCH_FAILED_MESSAGE = "Could not load transactions right now. Please try again shortly."
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+async def stream_report(user_id: str, final_state: dict):
+    """Yield SSE messages for node progress, LLM tokens and finished sections.
+
+    Each node's output is merged into final_state, which ends up holding the
+    same result app_logic.ainvoke would have returned.
+    """
+    initial_state = {"user_id": user_id}
+    final_state.update(initial_state)
+    async for event in app_logic.astream_events(initial_state, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node")
+
+        if kind == "on_chain_start" and event["name"] == node:
+            yield sse_event("progress", {"node": node})
+        elif kind == "on_chat_model_stream" and node in REPORT_SECTIONS:
+            text = event["data"]["chunk"].content
+            if text:
+                yield sse_event("delta", {"section": REPORT_SECTIONS[node], "text": text})
+        elif kind == "on_chain_end" and event["name"] == node:
+            # Full section text; also covers cache hits, which emit no tokens
+            output = event["data"].get("output") or {}
+            final_state.update(output)
+            for section in REPORT_SECTIONS.values():
+                if section in output:
+                    yield sse_event("section", {"section": section, "text": output[section]})
+            if output.get("fetch_failed"):
+                # The graph ends after the metrics step; no report follows
+                yield sse_event("error", {"message": FETCH_FAILED_MESSAGE})
+            elif "metrics" in output:
+                yield sse_event("metrics", format_metrics(output["metrics"]))
+
+    if not final_state.get("fetch_failed"):
+        yield sse_event("done", {})
+
+# Every workflow run (both routes and the warm-up) goes through this one loop: the
+# Gemini models are module-level and their async gRPC client is bound to one loop.
+workflow_loop = BackgroundLoop(name="workflow-loop")
+
+# One in-flight analysis per user_id (per process), shared by /analyze,
+# /analyze/stream and the warm-up thread
+analysis_flight = SingleFlight()
+
+def run_analysis(user_id: str) -> dict:
+    """Run the workflow for user_id, sharing a single run between concurrent callers."""
+    initial_state = {"user_id": user_id}
+    return analysis_flight.do(user_id, lambda: workflow_loop.run(app_logic.ainvoke(initial_state)))
+
+# user_id -> last full workflow result (JSON), served without re-running the pipeline.
+# In Redis every worker serves the reports a single worker computed.
+if redis_client is not None:
+    report_store = RedisCacheBackend(redis_client, prefix="pfaa:report:")
+else:
+    report_store = LRUCacheBackend(maxsize=64)
+
+def load_report(user_id: str) -> Optional[dict]:
+    raw = report_store.get(user_id)
+    return orjson.loads(raw) if raw is not None else None
+
+def precompute_report(user_id: str) -> bool:
+    """Run and store user_id's report; False if every attempt hit a failed fetch."""
+    for attempt in range(1, REPORT_FETCH_ATTEMPTS + 1):
+        results = run_analysis(user_id)
+        if not results.get("fetch_failed"):
+            report_store.set(user_id, orjson.dumps(results).decode(), ttl=REPORT_TTL)
+            return True
+        print(f"Transaction fetch failed for {user_id} (attempt {attempt}/{REPORT_FETCH_ATTEMPTS})")
+        if attempt < REPORT_FETCH_ATTEMPTS:
+            time.sleep(REPORT_RETRY_SECONDS)
+    return False
+
+def refresh_reports():
+    """Recompute every demo user's report, then schedule the next refresh.
+
+    Every worker runs this timer, but only the one that claims the current
+    refresh slot does the work; the others read its results from report_store.
+    """
+    slot = int(time.time() // REPORT_REFRESH_SECONDS)
+    if report_store.add(f"refresh-lock:{slot}", "1", ttl=REPORT_REFRESH_SECONDS):
+        for user_id in USER_IDS:
+            try:
+                if precompute_report(user_id):
+                    print(f"Precomputed report for user: {user_id}")
+                else:
+                    print(f"Skipped precomputed report for {user_id}; keeping the previous one")
+            except Exception as e:
+                print(f"Error precomputing report for {user_id}: {e}")
+
+    # Wake at the next slot boundary so every worker contends for the same lock
+    delay = REPORT_REFRESH_SECONDS - time.time() % REPORT_REFRESH_SECONDS
+    timer = threading.Timer(delay, refresh_reports)
+    timer.daemon = True
+    timer.start()
+
+def report_events(results: dict):
+    """SSE messages for an already finished report."""
+    if results.get("fetch_failed"):
+        yield sse_event("error", {"message": FETCH_FAILED_MESSAGE})
+        return
+    yield sse_event("metrics", format_metrics(results.get("metrics")))
+    for section in REPORT_SECTIONS.values():
+        yield sse_event("section", {"section": section, "text": results.get(section, "")})
+    yield sse_event("done", {})
+
+def shared_stream(user_id: str):
+    """Stream the pipeline for user_id, or replay the run another request already started."""
+    # Acquired inside the generator so an unconsumed response never holds the slot
+    future, is_leader = analysis_flight.acquire(user_id)
+
+    if not is_leader:
+        print(f"Joining in-flight analysis for user: {user_id}")
+        yield sse_event("progress", {"node": "joined"})
+        try:
+            try:
+                results = future.result()
+            except Abandoned:
+                results = run_analysis(user_id)
+        except Exception as e:
+            print(f"Error in shared analysis for {user_id}: {e}")
+            yield sse_event("error", {"message": "Analysis failed."})
+            return
+        yield from report_events(results)
+        return
+
+    print(f"Streaming analysis for user: {user_id}")
+    final_state = {}
     try:
-        json_match = re.search(r"\{[\s\S]*?\}", analysis_result)
-        if json_match:
-            data = json.loads(json_match.group(0))
-            income = data.get("total_income", 0)
-            spending = data.get("total_spending", 0)
-            net_flow = data.get("net_flow", 0)
-
-            metrics["Total Income"] = f"${income:,.2f}"
-            metrics["Total Spending"] = f"${abs(spending):,.2f}"
-            delta_color = "text-danger" if net_flow < 0 else "text-success"
-            metrics["Net Flow"] = (f"${net_flow:,.2f}", delta_color)
+        yield from workflow_loop.iterate(stream_report(user_id, final_state))
+        future.set_result(final_state)
     except Exception as e:
-        print(f"Error parsing metrics: {e}")
-    return metrics
+        future.set_exception(e)
+        raise
+    finally:
+        # If the client disconnected mid-stream, followers are told to retry
+        analysis_flight.release(user_id)
+
+if WARM_REPORTS:
+    # Clicks that reach the warming worker mid warm-up join its in-flight run through
+    # analysis_flight (both /analyze and /analyze/stream). Other workers run their own
+    # analysis until the report lands in report_store.
+    threading.Thread(target=refresh_reports, daemon=True).start()
 
 @app.route('/', methods=['GET'])
 def index():
-    user_ids = ["user_001", "user_002", "user_003", "user_004", "user_005"]
-    return render_template('index.html', user_ids=user_ids)
+    return render_template('index.html', user_ids=USER_IDS)
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
@@ -225,16 +534,34 @@ def analyze():
     if not user_id:
         return render_template('index.html', error="Please select a user ID.")
 
-    print(f"Starting analysis for user: {user_id}")
-    initial_state = {"user_id": user_id}
-    results = app_logic.invoke(initial_state)
-    print("Analysis complete.")
+    results = load_report(user_id)
+    if results is None:
+        print(f"Starting analysis for user: {user_id}")
+        results = run_analysis(user_id)
+        print("Analysis complete.")
+
+    if results.get("fetch_failed"):
+        return render_template('index.html', error=FETCH_FAILED_MESSAGE, user_id=user_id, user_ids=USER_IDS)
+
+    metrics = format_metrics(results.get("metrics"))
+
+    return render_template('index.html', results=results, user_id=user_id, metrics=metrics, user_ids=USER_IDS)
+
+@app.route('/analyze/stream', methods=['GET'])
+def analyze_stream():
+    user_id = request.args.get('user_id')
+    if not user_id:
+        return Response(sse_event("error", {"message": "Please select a user ID."}), mimetype='text/event-stream')
 
-    analysis_content = results.get("analysis_result", "No analysis available.")
-    metrics = parse_metrics(analysis_content)
+    results = load_report(user_id)
+    events = report_events(results) if results is not None else shared_stream(user_id)
 
-    user_ids = ["user_001", "user_002", "user_003", "user_004", "user_005"]
-    return render_template('index.html', results=results, user_id=user_id, metrics=metrics, user_ids=user_ids)
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=os.getenv("FLASK_DEBUG") == "1")
@@ -0,0 +1,44 @@
+# ==============================================================================
+# SHARED EVENT LOOP
+# ==============================================================================
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BackgroundLoop:
+    """One long-lived asyncio loop on a daemon thread, shared by every request thread.
+
+    Async clients (e.g. Gemini's grpc_asyncio channel) are created once per model
+    and bound to the loop they were first used on, so every workflow run has to
+    go through the same loop rather than a fresh asyncio.run() per request.
+    """
+
+    def __init__(self, name: str = "asyncio-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._serve, name=name, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Run coro on the loop and block the calling thread until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def iterate(self, agen: AsyncIterator[T]) -> Iterator[T]:
+        """Drive an async generator on the loop from synchronous code."""
+        async def next_item():
+            return await agen.__anext__()
+
+        try:
+            while True:
+                try:
+                    yield self.run(next_item())
+                except StopAsyncIteration:
+                    break
+        finally:
+            self.run(agen.aclose())
@@ -0,0 +1,26 @@
+# ==============================================================================
+# GUNICORN CONFIGURATION  (picked up automatically by `gunicorn app:app`)
+# ==============================================================================
+import os
+
+from dotenv import load_dotenv
+
+# Same .env as app.py, so the settings below see e.g. REDIS_HOST
+load_dotenv()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+
+# Each /analyze holds a worker for the full LLM round trip, so serve several at once.
+# Threads rather than gevent: requests block on the app's shared asyncio loop thread,
+# which does not mix well with gevent's monkey-patching.
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+
+# Precomputed reports are shared through Redis, where one worker warms them for all.
+# Without Redis each worker would run its own warm-up, so leave it off by default.
+if workers > 1 and not os.getenv("REDIS_HOST"):
+    os.environ.setdefault("WARM_REPORTS", "false")
+
+# Analyses can take tens of seconds; streamed responses stay open until the report is done.
+timeout = 120
@@ -0,0 +1,167 @@
+# ==============================================================================
+# LLM RESPONSE CACHE
+# ==============================================================================
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Protocol
+
+import orjson
+from langchain_core.messages import convert_to_messages, message_to_dict, messages_from_dict
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable
+
+
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[Any]: ...
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None: ...
+
+    def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool: ...
+
+
+class LRUCacheBackend:
+    """In-process LRU cache with optional per-entry expiry."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def add(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set key only if it is missing or expired; return whether it was set."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] >= time.monotonic()):
+                return False
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return True
+
+
+class RedisCacheBackend:
+    """Redis-backed cache, shared across worker processes. Values must be strings."""
+
+    def __init__(self, client, prefix: str = "pfaa:llm:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Redis cache error: {e}")
+            return None
+        return raw.decode() if isinstance(raw, bytes) else raw
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None) -> None:
+        try:
+            self.client.set(self.prefix + key, value, ex=ttl)
+        except Exception as e:
+            print(f"Redis cache error: {e}")
+
+    def add(self, key: str, value: str, ttl: Optional[int] = None) -> bool:
+        """SET NX: succeeds for exactly one caller across all processes."""
+        try:
+            return bool(self.client.set(self.prefix + key, value, nx=True, ex=ttl))
+        except Exception as e:
+            print(f"Redis cache error: {e}")
+            return False
+
+
+class CachedChatModel(Runnable):
+    """Wraps a chat model and short-circuits calls with an identical prompt.
+
+    Responses are cached as JSON (message dicts, or the schema's JSON for structured
+    output), never pickled, so a shared backend cannot inject code into the app.
+    """
+
+    def __init__(self, model: Runnable, backend: CacheBackend, ttl: int = 3600,
+                 model_name: Optional[str] = None, schema=None):
+        self.model = model
+        self.backend = backend
+        self.ttl = ttl
+        self.model_name = model_name or getattr(model, "model", type(model).__name__)
+        self.schema = schema
+
+    def _key(self, input) -> str:
+        if isinstance(input, PromptValue):
+            messages = input.to_messages()
+        elif isinstance(input, str):
+            messages = convert_to_messages([("human", input)])
+        else:
+            messages = convert_to_messages(input)
+        payload = {
+            "model": self.model_name,
+            "messages": [{"type": m.type, "content": m.content} for m in messages],
+        }
+        return hashlib.sha256(orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+    def with_structured_output(self, schema, **kwargs) -> "CachedChatModel":
+        return CachedChatModel(
+            self.model.with_structured_output(schema, **kwargs),
+            backend=self.backend,
+            ttl=self.ttl,
+            model_name=f"{self.model_name}:{schema.__name__}",
+            schema=schema,
+        )
+
+    def _dump(self, result) -> str:
+        if self.schema is not None:
+            return result.model_dump_json()
+        return orjson.dumps(message_to_dict(result)).decode()
+
+    def _load(self, raw: str):
+        if self.schema is not None:
+            return self.schema.model_validate_json(raw)
+        return messages_from_dict([orjson.loads(raw)])[0]
+
+    def _lookup(self, key: str):
+        raw = self.backend.get(key)
+        return self._load(raw) if raw is not None else None
+
+    def _store(self, key: str, result) -> None:
+        # Structured output can come back empty (None); never cache that
+        if result is not None:
+            self.backend.set(key, self._dump(result), ttl=self.ttl)
+
+    def invoke(self, input, config=None, **kwargs):
+        key = self._key(input)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        result = self.model.invoke(input, config, **kwargs)
+        self._store(key, result)
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        key = self._key(input)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        result = await self.model.ainvoke(input, config, **kwargs)
+        self._store(key, result)
+        return result
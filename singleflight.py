@@ -0,0 +1,56 @@
+# ==============================================================================
+# REQUEST COALESCING (SINGLE-FLIGHT)
+# ==============================================================================
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class Abandoned(Exception):
+    """The leader stopped before producing a result; followers should retry."""
+
+
+class SingleFlight:
+    """Shares one in-flight computation per key between concurrent callers.
+
+    Thread-based rather than asyncio-based: each request thread drives its own
+    event loop, so an asyncio.Future could not be awaited across requests.
+    """
+
+    def __init__(self):
+        self._futures: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: Hashable) -> Tuple[Future, bool]:
+        """Return (future, is_leader). The leader must resolve the future, then release(key)."""
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._futures[key] = future
+            return future, True
+
+    def release(self, key: Hashable) -> None:
+        with self._lock:
+            future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_exception(Abandoned(f"in-flight run for {key!r} was abandoned"))
+
+    def do(self, key: Hashable, fn: Callable[[], object]):
+        """Run fn() for key, or wait for the run another caller already started."""
+        while True:
+            future, is_leader = self.acquire(key)
+            if not is_leader:
+                try:
+                    return future.result()
+                except Abandoned:
+                    continue
+
+            try:
+                future.set_result(fn())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                self.release(key)
+            return future.result()
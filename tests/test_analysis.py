@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+import orjson
+import pyarrow as pa
+import pytest
+
+from analysis import combine_analysis, compute_metrics
+
+METRICS = {"total_income": 5000.0, "total_spending": -3200.5, "net_flow": 1799.5}
+HEADER = '```json\n{"total_income":5000.0,"total_spending":-3200.5,"net_flow":1799.5}\n```\n\n'
+
+
+def amounts(values, type=pa.float64()):
+    return pa.table({"amount": pa.array(values, type=type)})
+
+
+def test_combine_strips_nested_fenced_preamble_whole():
+    text = '```json\n{"a": {"b": 1}}\n```\n## Analysis\nSpending is high.'
+    assert combine_analysis(METRICS, text) == HEADER + "## Analysis\nSpending is high."
+
+
+def test_combine_strips_bare_json_line():
+    text = 'json {"total_income": 5000, "nested": {"x": 1}}\n## Analysis'
+    assert combine_analysis(METRICS, text) == HEADER + "## Analysis"
+
+
+def test_combine_keeps_text_without_preamble():
+    text = "## Analysis\nA json {block} later in the text stays.\n```json\n{}\n```"
+    assert combine_analysis(METRICS, text) == HEADER + text
+
+
+def test_combine_header_is_valid_json():
+    block = combine_analysis(METRICS, "ok").split("\n")[1]
+    assert orjson.loads(block) == METRICS
+
+
+def test_metrics_split_income_and_spending():
+    metrics = compute_metrics(amounts([1200.0, -50.25, 300.0, -449.75]))
+    assert metrics == {
+        "total_income": 1500.0,
+        "total_spending": -500.0,
+        "net_flow": 1000.0,
+        "transaction_count": 4,
+        "largest_transaction": 1200.0,
+        "smallest_transaction": -449.75,
+    }
+
+
+@pytest.mark.parametrize("table", [None, amounts([])])
+def test_metrics_without_rows_are_zero(table):
+    metrics = compute_metrics(table)
+    assert metrics["transaction_count"] == 0
+    assert metrics["total_income"] == metrics["total_spending"] == metrics["net_flow"] == 0
+
+
+def test_metrics_skip_null_amounts():
+    metrics = compute_metrics(amounts([100.0, None, -40.0]))
+    assert metrics["total_income"] == 100.0
+    assert metrics["total_spending"] == -40.0
+    assert metrics["transaction_count"] == 3
+    assert (metrics["largest_transaction"], metrics["smallest_transaction"]) == (100.0, -40.0)
+
+
+def test_metrics_all_null_amounts_are_zero():
+    metrics = compute_metrics(amounts([None, None]))
+    assert metrics["total_income"] == metrics["total_spending"] == metrics["net_flow"] == 0.0
+    assert metrics["largest_transaction"] == metrics["smallest_transaction"] == 0.0
+
+
+def test_metrics_zero_amounts_are_not_income():
+    metrics = compute_metrics(amounts([0.0, 0.0, 25.0]))
+    assert metrics["total_income"] == 25.0
+    assert metrics["total_spending"] == 0.0
+    assert metrics["smallest_transaction"] == 0.0
+
+
+def test_metrics_accept_decimal_amounts():
+    table = amounts([Decimal("10.50"), Decimal("-2.25")], type=pa.decimal128(12, 2))
+    metrics = compute_metrics(table)
+    assert metrics["total_income"] == 10.5
+    assert metrics["total_spending"] == -2.25
+    assert metrics["net_flow"] == 8.25
+    assert isinstance(metrics["net_flow"], float)
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from background_loop import BackgroundLoop
+
+
+class LoopBoundModel:
+    """Stand-in for a Gemini model whose async client is bound to its first loop."""
+
+    def __init__(self):
+        self.client_loop = None
+
+    async def respond(self, prompt):
+        loop = asyncio.get_running_loop()
+        if self.client_loop is None:
+            self.client_loop = loop
+        elif self.client_loop is not loop:
+            raise RuntimeError("client is attached to a different loop")
+        await asyncio.sleep(0)
+        return AIMessage(content=prompt.to_messages()[-1].content.upper())
+
+
+def make_workflow(model):
+    chain = ChatPromptTemplate.from_messages([("human", "{section} for {user_id}")]) | RunnableLambda(model.respond)
+
+    async def workflow(user_id):
+        # Fan out like the analyzer/budgetor/investor nodes
+        replies = await asyncio.gather(*(
+            chain.ainvoke({"section": section, "user_id": user_id})
+            for section in ("analysis", "budget", "investments")
+        ))
+        return [reply.content for reply in replies]
+
+    return workflow
+
+
+def test_fresh_loops_break_a_loop_bound_client():
+    workflow = make_workflow(LoopBoundModel())
+    asyncio.run(workflow("user_001"))
+    with pytest.raises(RuntimeError, match="different loop"):
+        asyncio.run(workflow("user_002"))
+
+
+def test_workflow_runs_twice_on_the_shared_loop():
+    workflow = make_workflow(LoopBoundModel())
+    loop = BackgroundLoop()
+
+    assert loop.run(workflow("user_001")) == ["ANALYSIS FOR USER_001", "BUDGET FOR USER_001", "INVESTMENTS FOR USER_001"]
+    assert loop.run(workflow("user_002"))[0] == "ANALYSIS FOR USER_002"
+
+
+def test_iterate_streams_and_closes_the_generator():
+    model = LoopBoundModel()
+    workflow = make_workflow(model)
+    loop = BackgroundLoop()
+    closed = []
+
+    async def stream(user_id):
+        try:
+            for text in await workflow(user_id):
+                yield text
+        finally:
+            closed.append(user_id)
+
+    loop.run(workflow("user_001"))
+    assert list(loop.iterate(stream("user_002")))[-1] == "INVESTMENTS FOR USER_002"
+
+    events = loop.iterate(stream("user_003"))
+    assert next(events) == "ANALYSIS FOR USER_003"
+    events.close()  # client disconnected mid-stream
+    assert closed == ["user_002", "user_003"]
@@ -0,0 +1,119 @@
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel
+
+from llm_cache import CachedChatModel, LRUCacheBackend, RedisCacheBackend
+
+
+class FakeRedis:
+    """Minimal stand-in for redis.Redis: bytes in storage, like the real client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode() if isinstance(value, str) else value
+        return True
+
+
+class Report(BaseModel):
+    summary: str
+
+
+def counting_model(reply="hello"):
+    calls = []
+
+    def respond(messages):
+        calls.append(messages)
+        return AIMessage(content=reply)
+
+    return RunnableLambda(respond), calls
+
+
+def test_redis_backend_stores_strings_not_pickles():
+    client = FakeRedis()
+    backend = RedisCacheBackend(client, prefix="t:")
+    backend.set("k", '{"a": 1}', ttl=10)
+    assert client.data["t:k"] == b'{"a": 1}'
+    assert backend.get("k") == '{"a": 1}'
+    assert backend.get("missing") is None
+
+
+def test_cached_model_round_trips_messages_through_redis():
+    model, calls = counting_model()
+    cached = CachedChatModel(model, backend=RedisCacheBackend(FakeRedis()), model_name="m")
+
+    first = cached.invoke("What is my net flow?")
+    second = cached.invoke("What is my net flow?")
+
+    assert len(calls) == 1
+    assert isinstance(second, AIMessage)
+    assert second.content == first.content == "hello"
+
+
+def test_structured_output_is_cached_as_schema_json():
+    calls = []
+
+    class StructuredModel:
+        model = "m"
+
+        def with_structured_output(self, schema, **kwargs):
+            def respond(messages):
+                calls.append(messages)
+                return schema(summary="fine")
+            return RunnableLambda(respond)
+
+    backend = LRUCacheBackend()
+    cached = CachedChatModel(StructuredModel(), backend=backend).with_structured_output(Report)
+
+    assert cached.invoke("q") == Report(summary="fine")
+    assert cached.invoke("q") == Report(summary="fine")
+    assert len(calls) == 1
+    assert all(isinstance(value, str) for value, _ in backend._data.values())
+
+
+def test_lru_backend_expires_entries_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("llm_cache.time.monotonic", lambda: now[0])
+    backend = LRUCacheBackend()
+
+    backend.set("short", "a", ttl=10)
+    backend.set("forever", "b")
+    now[0] += 11
+
+    assert backend.get("short") is None
+    assert backend.get("forever") == "b"
+
+
+def test_lru_backend_evicts_least_recently_used():
+    backend = LRUCacheBackend(maxsize=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+
+
+def test_add_only_sets_missing_keys():
+    for backend in (LRUCacheBackend(), RedisCacheBackend(FakeRedis())):
+        assert backend.add("lock", "1", ttl=60) is True
+        assert backend.add("lock", "2", ttl=60) is False
+        assert backend.get("lock") == "1"
+
+
+def test_lru_add_replaces_expired_entry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("llm_cache.time.monotonic", lambda: now[0])
+    backend = LRUCacheBackend()
+    assert backend.add("lock", "1", ttl=10)
+    now[0] += 11
+    assert backend.add("lock", "2", ttl=10)
+    assert backend.get("lock") == "2"
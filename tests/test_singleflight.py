@@ -0,0 +1,97 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import Abandoned, SingleFlight
+
+
+def run_concurrently(target, count):
+    results, errors = [], []
+
+    def worker():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+    return results, errors
+
+
+def test_concurrent_callers_share_one_run():
+    flight = SingleFlight()
+    calls = []
+
+    def analysis():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"user_id": "user_001"}
+
+    results, errors = run_concurrently(lambda: flight.do("user_001", analysis), 5)
+
+    assert len(calls) == 1
+    assert errors == []
+    assert results == [{"user_id": "user_001"}] * 5
+
+
+def test_leader_exception_reaches_every_follower():
+    flight = SingleFlight()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("BigQuery down")
+
+    results, errors = run_concurrently(lambda: flight.do("user_001", failing), 3)
+
+    assert len(calls) == 1
+    assert results == []
+    assert len(errors) == 3
+    assert all(str(e) == "BigQuery down" for e in errors)
+
+
+def test_key_is_released_after_each_run():
+    flight = SingleFlight()
+    assert flight.do("user_001", lambda: 1) == 1
+    assert flight.do("user_001", lambda: 2) == 2
+
+    def failing():
+        raise ValueError("no transactions")
+
+    with pytest.raises(ValueError):
+        flight.do("user_001", failing)
+    assert flight.do("user_001", lambda: 3) == 3
+
+
+def test_different_keys_do_not_wait_on_each_other():
+    flight = SingleFlight()
+    future, is_leader = flight.acquire("user_001")
+    assert is_leader
+
+    assert flight.do("user_002", lambda: "other") == "other"
+    flight.release("user_001")
+
+
+def test_followers_retry_when_the_leader_abandons():
+    flight = SingleFlight()
+    future, is_leader = flight.acquire("user_001")
+    assert is_leader
+
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.do("user_001", lambda: "retried")))
+    follower.start()
+    time.sleep(0.1)
+
+    # e.g. the streaming client disconnected before the report finished
+    flight.release("user_001")
+    follower.join(timeout=5)
+
+    assert results == ["retried"]
+    with pytest.raises(Abandoned):
+        future.result(timeout=0)